@@ -1,152 +1,125 @@
 import pandas as pd
-from db import get_engine
+from db import get_engine, psql_insert_copy
 from config import logger
 
-def load_stats_with_dates() -> pd.DataFrame:
+def finalize_aggregates(grouped: pd.DataFrame, prefix: str = "") -> pd.DataFrame:
     """
-    Load fighter_stats joined with fights (to get event_date) from Postgres
-    Returns one row per fighter per fight
+    Compute derived rate metrics from raw per-fighter sums/counts for one
+    prefix (e.g. 'career_', 'last3_')
+    Expects columns: fighter_id, {prefix}fights_count, {prefix}wins_count,
+    {prefix}total_time_seconds, {prefix}total_sig_strikes,
+    {prefix}total_tds_landed, {prefix}total_tds_attempts
     """
-    engine = get_engine()
-    query = """
-        SELECT
-            fs.fight_id,
-            fs.fighter_id,
-            fs.is_winner,
-            fs.knockdowns,
-            fs.sig_strikes_landed,
-            fs.sig_strikes_attempted,
-            fs.total_strikes_landed,
-            fs.total_strikes_attempted,
-            fs.td_landed,
-            fs.td_attempts,
-            fs.sub_attempts,
-            fs.control_time_seconds,
-            fs.time_fought_seconds,
-            f.event_date
-        FROM fighter_stats fs
-        JOIN fights f ON fs.fight_id = f.fight_id
-    """
-    df = pd.read_sql(query, engine)
-    df["event_date"] = pd.to_datetime(df["event_date"])
+    p = prefix
+    grouped = grouped.copy()
+    grouped[f"{p}wins_count"] = grouped[f"{p}wins_count"].fillna(0)
 
-    # make sure columns are numeric
-    num_cols = [
-        "knockdowns", "sig_strikes_landed", "sig_strikes_attempted",
-        "total_strikes_landed", "total_strikes_attempted", "td_landed",
-        "td_attempts", "sub_attempts", "control_time_seconds", "time_fought_seconds",
+    # compute derived metrics
+    grouped[f"{p}sig_strikes_per_min"] = grouped[f"{p}total_sig_strikes"] / (
+        grouped[f"{p}total_time_seconds"] / 60.0
+    )
+    grouped[f"{p}td_accuracy"] = (
+        grouped[f"{p}total_tds_landed"] / grouped[f"{p}total_tds_attempts"]
+    )
+    grouped.loc[grouped[f"{p}total_tds_attempts"] <= 0, f"{p}td_accuracy"] = pd.NA
+    grouped[f"{p}win_rate"] = grouped[f"{p}wins_count"] / grouped[f"{p}fights_count"]
+
+    # select final columns
+    final_cols = ["fighter_id"] + [
+        f"{p}fights_count",
+        f"{p}wins_count",
+        f"{p}win_rate",
+        f"{p}sig_strikes_per_min",
+        f"{p}td_accuracy",
     ]
-    df[num_cols] = df[num_cols].apply(pd.to_numeric, errors="coerce")
-    
-    return df
 
-def add_per_fight_rates(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Add per fight rate columns, filters out rows with invalid fight time
-    """
-    df = df.copy()
-    
-    # only keep fights with valid positive fight time
-    df = df[(df["time_fought_seconds"].notna()) & (df["time_fought_seconds"] > 0)]
-    
-    # sig strikes per minute
-    df["sig_strikes_per_min"] = df["sig_strikes_landed"] / (df["time_fought_seconds"] / 60.0)
-    
-    # TD accuracy
-    df["td_accuracy"] = df["td_landed"] / df["td_attempts"]
-    df.loc[df["td_attempts"] <= 0, "td_accuracy"] = pd.NA
-    
-    return df
+    return grouped[final_cols]
 
-def compute_aggregated_features(
-    df: pd.DataFrame, 
-    prefix: str = "", 
-    last_n: int | None = None
-) -> pd.DataFrame:
+
+def load_fighter_aggregates() -> pd.DataFrame:
     """
-    Compute aggregated features per fighter
+    Compute career and last-3-fights aggregates per fighter in a single
+    Postgres query
+    ROW_NUMBER() ranks each fighter's fights by recency, then conditional
+    aggregation (FILTER (WHERE rn <= 3)) produces both feature sets in one
+    scan — no second pass and no per-fight rows shipped to pandas
     """
-    if last_n:
-        df = df.sort_values(["fighter_id", "event_date"])
-        df = df.groupby("fighter_id", group_keys=False).tail(last_n)
-    
-    # aggregate stats
-    grouped = df.groupby("fighter_id", as_index=False).agg(
-        fights_count=("fight_id", "nunique"),
-        wins_count=("is_winner", lambda x: (x == True).sum()),
-        total_time_seconds=("time_fought_seconds", "sum"),
-        total_sig_strikes=("sig_strikes_landed", "sum"),
-        total_tds_landed=("td_landed", "sum"),
-        total_tds_attempts=("td_attempts", "sum"),
-    )
-    
-    # compute derived metrics
-    grouped["sig_strikes_per_min"] = grouped["total_sig_strikes"] / (
-        grouped["total_time_seconds"] / 60.0
-    )
-    grouped["td_accuracy"] = grouped["total_tds_landed"] / grouped["total_tds_attempts"]
-    grouped.loc[grouped["total_tds_attempts"] <= 0, "td_accuracy"] = pd.NA
-    grouped["win_rate"] = grouped["wins_count"] / grouped["fights_count"]
-    
-    # add prefix to columns (except fighter_id)
-    if prefix:
-        rename_map = {
-            col: f"{prefix}{col}" 
-            for col in grouped.columns 
-            if col != "fighter_id"
-        }
-        grouped = grouped.rename(columns=rename_map)
-    
-    # select final columns
-    final_cols = ["fighter_id"]
-    if prefix:
-        final_cols += [
-            f"{prefix}fights_count",
-            f"{prefix}wins_count",
-            f"{prefix}win_rate",
-            f"{prefix}sig_strikes_per_min",
-            f"{prefix}td_accuracy",
-        ]
-    else:
-        final_cols += [
-            "fights_count",
-            "wins_count",
-            "win_rate",
-            "sig_strikes_per_min",
-            "td_accuracy",
-        ]
-    
-    return grouped[final_cols]
+    engine = get_engine()
+    query = """
+        WITH ranked AS (
+            SELECT
+                fs.fighter_id,
+                fs.is_winner,
+                fs.time_fought_seconds,
+                fs.sig_strikes_landed,
+                fs.td_landed,
+                fs.td_attempts,
+                ROW_NUMBER() OVER (
+                    PARTITION BY fs.fighter_id
+                    ORDER BY f.event_date DESC
+                ) AS rn
+            FROM fighter_stats fs
+            JOIN fights f ON fs.fight_id = f.fight_id
+            WHERE fs.time_fought_seconds > 0
+        )
+        SELECT
+            fighter_id,
+            COUNT(*) AS career_fights_count,
+            COUNT(*) FILTER (WHERE is_winner) AS career_wins_count,
+            SUM(time_fought_seconds) AS career_total_time_seconds,
+            SUM(sig_strikes_landed) AS career_total_sig_strikes,
+            SUM(td_landed) AS career_total_tds_landed,
+            SUM(td_attempts) AS career_total_tds_attempts,
+            COUNT(*) FILTER (WHERE rn <= 3) AS last3_fights_count,
+            COUNT(*) FILTER (WHERE is_winner AND rn <= 3) AS last3_wins_count,
+            SUM(time_fought_seconds) FILTER (WHERE rn <= 3) AS last3_total_time_seconds,
+            SUM(sig_strikes_landed) FILTER (WHERE rn <= 3) AS last3_total_sig_strikes,
+            SUM(td_landed) FILTER (WHERE rn <= 3) AS last3_total_tds_landed,
+            SUM(td_attempts) FILTER (WHERE rn <= 3) AS last3_total_tds_attempts
+        FROM ranked
+        GROUP BY fighter_id
+    """
+    # Arrow-backed dtypes: result lands in columnar buffers with no
+    # object-dtype conversion hop for strings/nullable ints
+    return pd.read_sql(query, engine, dtype_backend="pyarrow")
 
 def build_and_save_features():
     """
     Load data, compute career and last-3 features, and save to database.
     """
     engine = get_engine()
-    
-    logger.info("Loading fighter_stats + fights from DB")
-    df = load_stats_with_dates()
-    logger.info(f"Loaded {len(df)} fighter-fight rows")
-    
-    logger.info("Adding per-fight rate columns")
-    df_rates = add_per_fight_rates(df)
-    logger.info(f"Rows with valid time_fought_seconds: {len(df_rates)}")
-    
-    logger.info("Computing career features")
-    df_career = compute_aggregated_features(df_rates, prefix="career_")
-    logger.info(f"Computed career features for {len(df_career)} fighters")
-    
-    logger.info("Computing last-3-fights features")
-    df_last3 = compute_aggregated_features(df_rates, prefix="last3_", last_n=3)
-    logger.info(f"Computed last-3 features for {len(df_last3)} fighters")
-    
+
+    logger.info("Computing career + last-3 aggregates in Postgres")
+    grouped = load_fighter_aggregates()
+    logger.info(f"Computed aggregates for {len(grouped)} fighters")
+
+    # derive rate metrics for both feature sets from the single result
+    df_career = finalize_aggregates(grouped, prefix="career_")
+    df_last3 = finalize_aggregates(grouped, prefix="last3_")
+
     # merge career + last3
     df_features = pd.merge(df_career, df_last3, on="fighter_id", how="left")
     logger.info(f"Final features rows: {len(df_features)}")
+
+    # downcast: counts to int32, rates to float32 — halves the bandwidth
+    # through every downstream stage (matchups, training, inference)
+    count_cols = [
+        c for c in df_features.columns
+        if c.endswith("fights_count") or c.endswith("wins_count")
+    ]
+    rate_cols = [
+        c for c in df_features.columns
+        if c != "fighter_id" and c not in count_cols
+    ]
+    df_features[count_cols] = df_features[count_cols].astype("int32")
+    df_features[rate_cols] = df_features[rate_cols].astype("float32")
     
     # add fighter names for convenience
     with engine.begin() as conn:
-        names = pd.read_sql("SELECT fighter_id, name FROM fighters", conn)
+        names = pd.read_sql(
+            "SELECT fighter_id, name FROM fighters", conn,
+            dtype_backend="pyarrow",
+        )
     df_features = df_features.merge(names, on="fighter_id", how="left")
     
     # reorder columns with name first
@@ -157,7 +130,10 @@ def build_and_save_features():
     
     # write to database
     with engine.begin() as conn:
-        df_features.to_sql("fighter_features", conn, if_exists="replace", index=False)
+        df_features.to_sql(
+            "fighter_features", conn, if_exists="replace", index=False,
+            method=psql_insert_copy, chunksize=10_000,
+        )
         logger.info("Wrote features to table 'fighter_features'")
 
 
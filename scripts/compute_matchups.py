@@ -1,11 +1,24 @@
+import os
+
+import numpy as np
 import pandas as pd
 from db import get_engine
-from config import logger
+from config import logger, MATCHUPS_PARQUET_PATH
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
 
 
 def load_fighter_features(engine) -> pd.DataFrame:
-    """Load fighter features from the database"""
-    return pd.read_sql("SELECT * FROM fighter_features", engine)
+    """Load fighter features from the database (numeric columns as float32)"""
+    df = pd.read_sql("SELECT * FROM fighter_features", engine, dtype_backend="pyarrow")
+
+    num_cols = df.columns.difference(["fighter_id", "name"])
+    df[num_cols] = df[num_cols].astype("float32")
+
+    return df
 
 
 def load_completed_fights(engine) -> pd.DataFrame:
@@ -22,34 +35,33 @@ def load_completed_fights(engine) -> pd.DataFrame:
         FROM fights
         WHERE winner_id IS NOT NULL
     """
-    df = pd.read_sql(query, engine)
+    df = pd.read_sql(query, engine, dtype_backend="pyarrow")
     df["event_date"] = pd.to_datetime(df["event_date"])
     return df
 
 
 def add_fighter_features(
     fights: pd.DataFrame,
-    features: pd.DataFrame,
+    feat_idx: pd.DataFrame,
     fighter_num: int
 ) -> pd.DataFrame:
     """
-    Join fighter features to fights for a specific fighter (1 or 2)
-    Returns DataFrame with added features prefixed by f{fighter_num}_
+    Look up fighter features for a specific fighter (1 or 2) against a
+    fighter_id-indexed feature frame
+    A reindex is a single O(N) hash probe per row — no merge planning and
+    no copy of the fights columns
+    Returns just the feature block, prefixed f{fighter_num}_ and aligned
+    to fights' rows
     """
     fighter_col = f"fighter{fighter_num}_id"
     prefix = f"f{fighter_num}_"
-    
-    # get numeric feature columns (exclude fighter_id and name)
-    feature_cols = [c for c in features.columns if c not in ("fighter_id", "name")]
-    
-    # rename columns with prefix
-    rename_map = {
-        "fighter_id": fighter_col,
-        **{col: f"{prefix}{col}" for col in feature_cols}
-    }
-    fighter_feats = features[["fighter_id"] + feature_cols].rename(columns=rename_map)
-    
-    return fights.merge(fighter_feats, on=fighter_col, how="inner")
+
+    # add_prefix rewrites the column Index in one pass — no per-column
+    # rename map to build
+    block = feat_idx.reindex(fights[fighter_col].to_numpy()).add_prefix(prefix)
+    block.index = fights.index
+
+    return block
 
 
 def add_fighter_names(
@@ -58,34 +70,74 @@ def add_fighter_names(
 ) -> pd.DataFrame:
     """
     Add fighter names to the fights DataFrame
+    A dict map per id column replaces the old pair of merges — two O(N)
+    hash probes, no join planning, no frame copies
     """
-    names = features[["fighter_id", "name"]]
-    
-    # add fighter1 names
-    f1_names = names.rename(columns={"fighter_id": "fighter1_id", "name": "fighter1_name"})
-    fights = fights.merge(f1_names, on="fighter1_id", how="left")
-    
-    # add fighter2 names
-    f2_names = names.rename(columns={"fighter_id": "fighter2_id", "name": "fighter2_name"})
-    fights = fights.merge(f2_names, on="fighter2_id", how="left")
-    
+    name_map = dict(zip(features["fighter_id"].to_numpy(), features["name"].to_numpy()))
+
+    fights["fighter1_name"] = fights["fighter1_id"].map(name_map)
+    fights["fighter2_name"] = fights["fighter2_id"].map(name_map)
+
     return fights
 
 
 def add_difference_features(df: pd.DataFrame, feature_cols: list[str]) -> pd.DataFrame:
     """
     Add difference features (fighter1 - fighter2) for each numeric feature
+    All columns are subtracted in one NumPy block operation instead of
+    one column-insert per feature
     """
-    df = df.copy()
-    
-    for col in feature_cols:
-        f1_col = f"f1_{col}"
-        f2_col = f"f2_{col}"
-        
-        if f1_col in df.columns and f2_col in df.columns:
-            df[f"diff_{col}"] = df[f1_col] - df[f2_col]
-    
-    return df
+    pairs = [
+        col for col in feature_cols
+        if f"f1_{col}" in df.columns and f"f2_{col}" in df.columns
+    ]
+    if not pairs:
+        return df
+
+    f1_block = df[[f"f1_{col}" for col in pairs]].to_numpy(dtype=np.float32, copy=False)
+    f2_block = df[[f"f2_{col}" for col in pairs]].to_numpy(dtype=np.float32, copy=False)
+    diffs = pd.DataFrame(
+        f1_block - f2_block,
+        columns=[f"diff_{col}" for col in pairs],
+        index=df.index,
+    )
+
+    # shallow concat: existing column blocks are referenced, not duplicated
+    return pd.concat([df, diffs], axis=1)
+
+
+def build_matchups_duckdb(
+    fights: pd.DataFrame,
+    features: pd.DataFrame,
+    feature_cols: list[str],
+) -> pd.DataFrame:
+    """
+    Build the full matchup dataset with one DuckDB query over the
+    in-memory frames: f1/f2 self-join on fighter features, names, the
+    f1_win label, and every diff_ column, all executed vectorized in C++
+    """
+    con = duckdb.connect()
+    con.register("fights", fights)
+    con.register("features", features)
+
+    # generate the f1_/f2_/diff_ select list programmatically
+    select_parts = [
+        "fights.*",
+        "f1.name AS fighter1_name",
+        "f2.name AS fighter2_name",
+        "CAST(fights.winner_id = fights.fighter1_id AS INT) AS f1_win",
+    ]
+    select_parts += [f'f1."{c}" AS "f1_{c}"' for c in feature_cols]
+    select_parts += [f'f2."{c}" AS "f2_{c}"' for c in feature_cols]
+    select_parts += [f'(f1."{c}" - f2."{c}") AS "diff_{c}"' for c in feature_cols]
+
+    query = f"""
+        SELECT {", ".join(select_parts)}
+        FROM fights
+        JOIN features f1 ON fights.fighter1_id = f1.fighter_id
+        JOIN features f2 ON fights.fighter2_id = f2.fighter_id
+    """
+    return con.sql(query).df()
 
 
 def build_matchup_dataset() -> None:
@@ -110,27 +162,50 @@ def build_matchup_dataset() -> None:
     
     # get feature column names for later use
     feature_cols = [c for c in features.columns if c not in ("fighter_id", "name")]
-    
-    # join fighter features for both fighters
-    logger.info("Joining fighter features")
-    df = add_fighter_features(fights, features, fighter_num=1)
-    df = add_fighter_features(df, features, fighter_num=2)
-    logger.info(f"After joining features: {len(df)} fights with both fighters")
-    
-    # add fighter names for readability
-    df = add_fighter_names(df, features)
-    
-    # create label: did fighter1 win?
-    df["f1_win"] = (df["winner_id"] == df["fighter1_id"]).astype(int)
-    
-    # add difference features
-    logger.info("Computing difference features")
-    df = add_difference_features(df, feature_cols)
-    
-    # save to database
-    with engine.begin() as conn:
-        df.to_sql("fight_matchups", conn, if_exists="replace", index=False)
-        logger.info(f"Wrote {len(df)} rows to fight_matchups table")
+
+    if duckdb is not None:
+        # one vectorized plan: self-join + names + label + diff columns
+        logger.info("Building matchup dataset in DuckDB")
+        df = build_matchups_duckdb(fights, features, feature_cols)
+        logger.info(f"After joining features: {len(df)} fights with both fighters")
+    else:
+        # pandas fallback when duckdb isn't installed
+        logger.info("Joining fighter features")
+        feat_idx = features.set_index("fighter_id")[feature_cols]
+
+        # keep only fights where both fighters have features (was an inner merge)
+        has_feats = (
+            fights["fighter1_id"].isin(feat_idx.index)
+            & fights["fighter2_id"].isin(feat_idx.index)
+        )
+        fights = fights[has_feats].reset_index(drop=True)
+
+        f1_block = add_fighter_features(fights, feat_idx, fighter_num=1)
+        f2_block = add_fighter_features(fights, feat_idx, fighter_num=2)
+        df = pd.concat([fights, f1_block, f2_block], axis=1)
+        logger.info(f"After joining features: {len(df)} fights with both fighters")
+
+        # add fighter names for readability
+        df = add_fighter_names(df, features)
+
+        # create label: did fighter1 win?
+        df["f1_win"] = (df["winner_id"] == df["fighter1_id"]).astype(int)
+
+        # add difference features
+        logger.info("Computing difference features")
+        df = add_difference_features(df, feature_cols)
+    
+    # save as Parquet: columnar + compressed, so training can read only the
+    # columns (and row groups) it needs instead of re-scanning Postgres
+    os.makedirs(os.path.dirname(MATCHUPS_PARQUET_PATH), exist_ok=True)
+    df.to_parquet(
+        MATCHUPS_PARQUET_PATH,
+        engine="pyarrow",
+        compression="zstd",
+        row_group_size=50_000,
+        index=False,
+    )
+    logger.info(f"Wrote {len(df)} rows to {MATCHUPS_PARQUET_PATH}")
 
 
 if __name__ == "__main__":
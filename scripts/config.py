@@ -9,6 +9,9 @@ DB_URL = os.getenv("DB_URL")
 UFCSTATS_BASE = "http://www.ufcstats.com"
 BETMMA_NEXT_EVENT_URL = "https://www.betmma.tips/next_ufc_event.php"
 
+# columnar output of compute_matchups, read by training
+MATCHUPS_PARQUET_PATH = "data/fight_matchups.parquet"
+
 logging.basicConfig(
     level=logging.INFO,
     format="[%(asctime)s] %(levelname)s - %(message)s",
@@ -1,24 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
 from sqlalchemy import text
-from db import get_engine
+from db import get_engine, psql_insert_copy
 from config import logger
-from scrape_ufcstats import get_completed_event_urls, parse_event
+from scrape_ufcstats import (
+    FIGHT_COLS,
+    FIGHTER_COLS,
+    STATS_COLS,
+    extract_fight_urls,
+    fetch_event_html,
+    fetch_many_cached,
+    get_completed_event_urls,
+    parse_event,
+    parse_event_from_html,
+)
+
+# events to accumulate before flushing one batched insert transaction
+FLUSH_EVERY = 20
+
+# concurrent event scrapes; parsing is HTTP-bound so threads overlap the waits
+SCRAPE_WORKERS = 8
+
+# stat columns that are counts/durations; built as nullable Int32 so missing
+# values survive as NULL through the CSV COPY
+_STATS_COUNT_COLS = [
+    "knockdowns", "sig_strikes_landed", "sig_strikes_attempted",
+    "total_strikes_landed", "total_strikes_attempted",
+    "td_landed", "td_attempts", "sub_attempts",
+    "control_time_seconds", "time_fought_seconds",
+]
+
+
+def _frames_from_rows(fighter_rows, fight_rows, stats_rows):
+    """
+    Build the three insert-ready DataFrames from accumulated row dicts —
+    one typed construction per batch instead of one per event
+    """
+    df_fighters = pd.DataFrame.from_records(fighter_rows, columns=FIGHTER_COLS)
+    df_fights = pd.DataFrame.from_records(fight_rows, columns=FIGHT_COLS)
+    df_stats = pd.DataFrame.from_records(stats_rows, columns=STATS_COLS)
+    if not df_stats.empty:
+        df_stats = df_stats.astype({c: "Int32" for c in _STATS_COUNT_COLS})
+    return df_fighters, df_fights, df_stats
 
 def _insert_event_data(engine, df_fighters, df_fights, df_stats):
     """
-    Insert parsed DataFrames for a single event into the DB 
+    Insert parsed DataFrames into the DB in one transaction
+    Flush sink for the batched loader: the frames hold up to FLUSH_EVERY
+    events of rows, so a failure (e.g. a PK violation) rolls back the
+    whole batch, not a single event
     """
     with engine.begin() as conn:
         if not df_fighters.empty:
             df_fighters = df_fighters.drop_duplicates(subset=["fighter_id"])
-            df_fighters.to_sql("fighters", conn, if_exists="append", index=False)
+            df_fighters.to_sql(
+                "fighters", conn, if_exists="append", index=False,
+                method=psql_insert_copy,
+            )
             logger.info(f"Inserted {len(df_fighters)} fighters")
 
         if not df_fights.empty:
-            df_fights.to_sql("fights", conn, if_exists="append", index=False)
+            df_fights.to_sql(
+                "fights", conn, if_exists="append", index=False,
+                method=psql_insert_copy,
+            )
             logger.info(f"Inserted {len(df_fights)} fights")
 
         if not df_stats.empty:
-            df_stats.to_sql("fighter_stats", conn, if_exists="append", index=False)
+            df_stats.to_sql(
+                "fighter_stats", conn, if_exists="append", index=False,
+                method=psql_insert_copy,
+            )
             logger.info(f"Inserted {len(df_stats)} fighter_stats rows")
 
 
@@ -28,8 +82,11 @@ def load_single_event(event_url: str):
     """
     engine = get_engine()
 
-    df_fighters, df_fights, df_stats = parse_event(event_url)
-    
+    fighter_rows, fight_rows, stats_rows = parse_event(event_url)
+    df_fighters, df_fights, df_stats = _frames_from_rows(
+        fighter_rows, fight_rows, stats_rows
+    )
+
     logger.info(f"Got {len(df_fighters)} fighters and {len(df_fights)} fights")
 
     with engine.begin() as conn:
@@ -55,31 +112,78 @@ def load_recent_events(num_events: int = 5):
     
     # track fighters added in THIS run
     seen_fighter_ids: set[str] = set()
-    
-    # process each event
-    for url in event_urls:
-        logger.info(f"Processing event {url}")
-        
-        df_fighters, df_fights, df_stats = parse_event(url)
-        logger.info(
-            f"Scraped: {len(df_fighters)} fighters, "
-            f"{len(df_fights)} fights, {len(df_stats)} stats"
+
+    # accumulate plain row dicts and insert in large batches: one typed
+    # DataFrame build and one transaction (one COPY per table) per
+    # FLUSH_EVERY events instead of per-event frames and concats
+    fighters_buf: list[dict] = []
+    fights_buf: list[dict] = []
+    stats_buf: list[dict] = []
+
+    def flush_buffers():
+        if not fights_buf:
+            return
+        df_fighters, df_fights, df_stats = _frames_from_rows(
+            fighters_buf, fights_buf, stats_buf
         )
-        # if no fights/stats, probably upcoming / broken event
-        if df_fights.empty or df_stats.empty:
-            logger.info(f"No completed fights/stats for event {url} (likely upcoming). Skipping insert.")
-            continue
-        
-        if not df_fighters.empty:
-            new_mask = ~df_fighters["fighter_id"].isin(seen_fighter_ids)
-            new_fighters = df_fighters[new_mask].copy()
-            # update the seen set with ONLY the new ones
-            seen_fighter_ids.update(new_fighters["fighter_id"].tolist())
-        else:
-            new_fighters = df_fighters  # empty
-
-        # insert data into database
-        _insert_event_data(engine, new_fighters, df_fights, df_stats)
+        logger.info(f"Flushing batch of {len(df_fights)} fights to DB")
+        _insert_event_data(engine, df_fighters, df_fights, df_stats)
+        fighters_buf.clear()
+        fights_buf.clear()
+        stats_buf.clear()
+
+    # stage 1: download every page up front — event pages through the
+    # cached session (threads), then all fight pages in one cache-backed
+    # batch so the aggregate fan-out stays bounded by FETCH_CONCURRENCY
+    # and re-runs read from disk
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as fetch_pool:
+        event_htmls = list(fetch_pool.map(fetch_event_html, event_urls))
+
+    fight_urls_per_event = [extract_fight_urls(html) for html in event_htmls]
+    all_fight_urls = [u for urls in fight_urls_per_event for u in urls]
+    logger.info(f"Fetching {len(all_fight_urls)} fight pages")
+    all_fight_htmls = dict(zip(all_fight_urls, fetch_many_cached(all_fight_urls)))
+    fight_htmls_per_event = [
+        {u: all_fight_htmls[u] for u in urls} for urls in fight_urls_per_event
+    ]
+
+    # stage 2: parse across processes — with all pages in hand the parse
+    # step is pure CPU and the GIL blocks thread-level scaling. map()
+    # yields results in URL order so the fighter dedup below stays
+    # deterministic; DB inserts remain serial
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as parse_pool:
+        parsed = parse_pool.map(
+            parse_event_from_html,
+            event_urls, event_htmls, fight_htmls_per_event,
+            chunksize=4,
+        )
+
+        for event_num, (url, (fighter_rows, fight_rows, stats_rows)) in enumerate(
+            zip(event_urls, parsed), start=1
+        ):
+            logger.info(
+                f"Scraped {url}: {len(fighter_rows)} fighters, "
+                f"{len(fight_rows)} fights, {len(stats_rows)} stats"
+            )
+            # if no fights/stats, probably upcoming / broken event
+            if not fight_rows or not stats_rows:
+                logger.info(f"No completed fights/stats for event {url} (likely upcoming). Skipping insert.")
+                continue
+
+            for fighter in fighter_rows:
+                # buffer ONLY fighters not already seen this run
+                if fighter["fighter_id"] not in seen_fighter_ids:
+                    seen_fighter_ids.add(fighter["fighter_id"])
+                    fighters_buf.append(fighter)
+
+            fights_buf.extend(fight_rows)
+            stats_buf.extend(stats_rows)
+
+            if event_num % FLUSH_EVERY == 0:
+                flush_buffers()
+
+    # whatever is left over
+    flush_buffers()
  
 
 if __name__ == "__main__":
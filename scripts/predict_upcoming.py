@@ -1,5 +1,7 @@
 import os
 import argparse
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
 import joblib
@@ -9,54 +11,86 @@ from config import logger
 
 MODEL_PATH = "models/baseline_logreg.pkl"
 
+@lru_cache(maxsize=1)
 def load_model():
-    """Load the trained baseline model and feature list"""
+    """Load the trained baseline model, scaler and feature list (cached per process)"""
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError(
             f"Model file not found at {MODEL_PATH}. "
             "Run scripts/train_baseline_model.py first."
         )
-    
+
     bundle = joblib.load(MODEL_PATH)
     model = bundle["model"]
+    # model was fit on standardized features; None for pre-scaler bundles
+    scaler = bundle.get("scaler")
     # list of diff_* column names
-    feature_cols = bundle["feature_cols"]  
-    return model, feature_cols
+    feature_cols = bundle["feature_cols"]
+    return model, scaler, feature_cols
 
 
+@lru_cache(maxsize=1)
 def load_fighter_features() -> pd.DataFrame:
-    """Load fighter_features from the database"""
+    """
+    Load fighter_features from the database (numeric columns as float32)
+    Cached so batch prediction pays for the SELECT once per process
+    """
     engine = get_engine()
-    df = pd.read_sql("SELECT * FROM fighter_features", engine)
+    df = pd.read_sql("SELECT * FROM fighter_features", engine, dtype_backend="pyarrow")
+
+    num_cols = df.columns.difference(["fighter_id", "name"])
+    df[num_cols] = df[num_cols].astype("float32")
+
     return df
 
 
-def resolve_fighter(term: str, feats: pd.DataFrame) -> pd.Series:
+def build_fighter_index(feats: pd.DataFrame) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Precompute lookup structures for resolve_fighter:
+    a fighter_id -> row position dict and a lowercase name array
+    Built once per session so each lookup is a dict probe or one
+    vectorized (non-regex) substring scan
+    """
+    id_to_row = {fid: i for i, fid in enumerate(feats["fighter_id"].to_numpy())}
+    names_lower = feats["name"].fillna("").str.lower().to_numpy(dtype=str)
+    return id_to_row, names_lower
+
+
+def resolve_fighter(
+    term: str,
+    feats: pd.DataFrame,
+    index: tuple[dict[str, int], np.ndarray] | None = None,
+) -> pd.Series:
     """
     Resolve a fighter by fighter_id or by (partial) name match
     Returns a single row (pd.Series) from fighter_features
     """
+    if index is None:
+        index = build_fighter_index(feats)
+    id_to_row, names_lower = index
+
     # exact fighter_id match
-    if term in feats["fighter_id"].values:
-        row = feats.loc[feats["fighter_id"] == term].iloc[0]
+    row_pos = id_to_row.get(term)
+    if row_pos is not None:
+        row = feats.iloc[row_pos]
         logger.info(f"Resolved '{term}' as fighter_id {row['fighter_id']} ({row['name']})")
         return row
 
-    # case-insensitive partial name match
-    mask = feats["name"].str.contains(term, case=False, na=False)
-    matches = feats.loc[mask]
+    # case-insensitive partial name match (vectorized, no per-cell regex)
+    hits = np.flatnonzero(np.char.find(names_lower, term.lower()) >= 0)
 
-    if matches.empty:
+    if hits.size == 0:
         raise ValueError(f"No fighter found matching '{term}'")
 
-    if len(matches) > 1:
+    if hits.size > 1:
+        first = feats.iloc[hits[0]]
         logger.warning(
             f"Multiple fighters matched '{term}'. "
-            f"Using first match: {matches.iloc[0]['name']} "
-            f"(fighter_id={matches.iloc[0]['fighter_id']})"
+            f"Using first match: {first['name']} "
+            f"(fighter_id={first['fighter_id']})"
         )
 
-    row = matches.iloc[0]
+    row = feats.iloc[hits[0]]
     logger.info(f"Resolved '{term}' as fighter_id {row['fighter_id']} ({row['name']})")
     return row
 
@@ -70,46 +104,92 @@ def build_feature_row(
     Given two fighter_features rows and the model's expected diff_* columns,
     build a single-row DataFrame X matching the model's feature order
     diff_feature_cols: e.g. ["diff_career_win_rate", "diff_last3_sig_strikes_per_min", ...]
+    The whole row is computed as one NumPy subtraction rather than a
+    per-column Python loop
     """
     # fighter_features columns: fighter_id, name, career_..., last3_...
     # diff_feature_cols: "diff_" + base column name
-    row_values = {}
-
-    for diff_col in diff_feature_cols:
-        if not diff_col.startswith("diff_"):
-            base = diff_col
-        else:
-            base = diff_col[len("diff_"):]  
-
-        if base in f1_row.index and base in f2_row.index:
-            f1_val = f1_row[base]
-            f2_val = f2_row[base]
-            # safe numeric cast
-            try:
-                f1_val = float(f1_val) if pd.notna(f1_val) else 0.0
-            except Exception:
-                f1_val = 0.0
-            try:
-                f2_val = float(f2_val) if pd.notna(f2_val) else 0.0
-            except Exception:
-                f2_val = 0.0
-
-            diff_val = f1_val - f2_val
-        else:
-            # if the base feature doesn't exist (schema changed, etc.), fall back to 0
-            logger.warning(
-                f"Base feature '{base}' not found in fighter_features; "
-                f"setting {diff_col} = 0"
-            )
-            diff_val = 0.0
-
-        row_values[diff_col] = diff_val
+    bases = [
+        c[len("diff_"):] if c.startswith("diff_") else c
+        for c in diff_feature_cols
+    ]
+
+    # bases missing from fighter_features (schema changed, etc.) become NaN
+    # in the reindex below and end up as 0 after nan_to_num
+    missing = [b for b in bases if b not in f1_row.index or b not in f2_row.index]
+    if missing:
+        logger.warning(
+            f"Base features not found in fighter_features; using 0: {missing}"
+        )
+
+    f1_vals = pd.to_numeric(f1_row.reindex(bases), errors="coerce").to_numpy(dtype=np.float64)
+    f2_vals = pd.to_numeric(f2_row.reindex(bases), errors="coerce").to_numpy(dtype=np.float64)
+
+    f1_vals = np.nan_to_num(f1_vals, nan=0.0, posinf=0.0, neginf=0.0)
+    f2_vals = np.nan_to_num(f2_vals, nan=0.0, posinf=0.0, neginf=0.0)
 
     # create DataFrame with a single row, ensure correct column order
-    X = pd.DataFrame([row_values], columns=diff_feature_cols)
-    X = X.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    return pd.DataFrame((f1_vals - f2_vals).reshape(1, -1), columns=diff_feature_cols)
+
+
+def build_feature_matrix(
+    feats: pd.DataFrame,
+    diff_feature_cols: list[str],
+) -> np.ndarray:
+    """
+    Precompute the numeric fighter-feature matrix for repeated scoring:
+    one row per fighter, one column per model base feature, with NaN/inf
+    already zeroed
+    Pairing it with the fighter_id -> row dict from build_fighter_index
+    turns each matchup into a row gather + subtract on this matrix
+    """
+    bases = [
+        c[len("diff_"):] if c.startswith("diff_") else c
+        for c in diff_feature_cols
+    ]
+    mat = (
+        feats.reindex(columns=bases)
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=np.float64)
+    )
+    return np.nan_to_num(mat, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def predict_batch(pairs: list[tuple[str, str]]) -> pd.DataFrame:
+    """
+    Predict P(fighter1 wins) for many matchups in one pass
+    The model bundle, fighter_features load, lookup index, and feature
+    matrix are shared across all pairs; the whole batch is one 2-D
+    gather/subtract on the matrix and a single predict_proba call
+    Returns a DataFrame with resolved ids/names and p_f1_win per pair
+    """
+    model, scaler, feature_cols = load_model()
+    feats = load_fighter_features()
+    index = build_fighter_index(feats)
+    id_to_row = index[0]
+    mat = build_feature_matrix(feats, feature_cols)
+
+    f1_rows = []
+    f2_rows = []
+    for f1_term, f2_term in pairs:
+        f1_rows.append(resolve_fighter(f1_term, feats, index))
+        f2_rows.append(resolve_fighter(f2_term, feats, index))
+
+    i1 = np.fromiter((id_to_row[r["fighter_id"]] for r in f1_rows), dtype=np.intp)
+    i2 = np.fromiter((id_to_row[r["fighter_id"]] for r in f2_rows), dtype=np.intp)
+
+    X = mat[i1] - mat[i2]
+    if scaler is not None:
+        X = scaler.transform(X)
+    proba = model.predict_proba(X)[:, 1]
 
-    return X
+    return pd.DataFrame({
+        "fighter1_id": [r["fighter_id"] for r in f1_rows],
+        "fighter1_name": [r["name"] for r in f1_rows],
+        "fighter2_id": [r["fighter_id"] for r in f2_rows],
+        "fighter2_name": [r["name"] for r in f2_rows],
+        "p_f1_win": proba,
+    })
 
 
 def predict_matchup(f1_term: str, f2_term: str):
@@ -117,20 +197,23 @@ def predict_matchup(f1_term: str, f2_term: str):
     Predict probability that fighter1 (f1_term) wins against fighter2 (f2_term)
     """
     logger.info(f"Loading model from {MODEL_PATH}")
-    model, feature_cols = load_model()
+    model, scaler, feature_cols = load_model()
 
     logger.info("Loading fighter_features from DB")
     feats = load_fighter_features()
 
-    # resolve fighters
-    f1_row = resolve_fighter(f1_term, feats)
-    f2_row = resolve_fighter(f2_term, feats)
+    # resolve fighters against one precomputed index
+    index = build_fighter_index(feats)
+    f1_row = resolve_fighter(f1_term, feats, index)
+    f2_row = resolve_fighter(f2_term, feats, index)
 
     f1_name = f1_row["name"]
     f2_name = f2_row["name"]
 
     logger.info(f"Building feature vector for matchup: {f1_name} vs {f2_name}")
-    X = build_feature_row(f1_row, f2_row, feature_cols)
+    X = build_feature_row(f1_row, f2_row, feature_cols).to_numpy()
+    if scaler is not None:
+        X = scaler.transform(X)
 
     # predict
     proba = model.predict_proba(X)[0, 1]  # P(f1_win)
@@ -1,8 +1,16 @@
+import asyncio
+import os
+from io import BytesIO
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.response import HTTPResponse
+from urllib3.util.retry import Retry
+import aiohttp
+from bs4 import BeautifulSoup, SoupStrainer
+from selectolax.lexbor import LexborHTMLParser
 import re
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import urllib.parse as urlparse
 from config import logger, UFCSTATS_BASE
 
@@ -10,18 +18,164 @@ from config import logger, UFCSTATS_BASE
 This file scrapes from UFCstats and then separates its data into the three dataframes:
 fighters, fights, stats
 """
- 
+
 COMPLETED_EVENTS_URL = f"{UFCSTATS_BASE}/statistics/events/completed?page=all"
 
-def get_soup(url: str) -> BeautifulSoup:
+_UA = {"User-Agent": "Mozilla/5.0"}
+
+# cap on in-flight requests when fanning out over fight-details pages
+FETCH_CONCURRENCY = 16
+
+# UFCStats pages are mostly boilerplate menus/footers; the strainer keeps
+# the parser from building BS4 nodes for anything we never look at
+_EVENT_STRAINER = SoupStrainer(["table", "span", "li"])  # title, date, fights table
+
+# the completed-events index is only mined for links
+_LINK_STRAINER = SoupStrainer("a", href=True)
+
+# month-name lookup for event dates ('January 20, 2024'); a dict probe and
+# two int() calls beat strptime's per-call format walk
+_MONTHS = {
+    m: i for i, m in enumerate(
+        ["January", "February", "March", "April", "May", "June", "July",
+         "August", "September", "October", "November", "December"],
+        start=1,
+    )
+}
+
+# patterns used on every row/cell, compiled once instead of per call
+_FIGHT_DETAILS_RE = re.compile("fight-details")
+_FIGHTER_DETAILS_RE = re.compile("fighter-details")
+_TABLE_CLS_RE = re.compile("b-fight-details__table")
+_X_OF_Y_RE = re.compile(r"(\d+)\s*of\s*(\d+)")
+
+# header labels the totals table must contain
+_REQUIRED_LABELS = ("fighter", "kd", "sig. str.", "total str.", "td", "sub. att", "ctrl")
+
+# column order of the row dicts parse_event emits; the ETL driver builds
+# DataFrames from these once per batch instead of once per event
+FIGHTER_COLS = ["fighter_id", "name"]
+FIGHT_COLS = [
+    "fight_id", "event_name", "event_date", "weight_class",
+    "fighter1_id", "fighter2_id", "winner_id", "method",
+    "round_ended", "time_ended",
+    "fighter1_closing_odds", "fighter2_closing_odds",
+]
+STATS_COLS = [
+    "fight_id", "fighter_id", "is_winner", "knockdowns",
+    "sig_strikes_landed", "sig_strikes_attempted",
+    "total_strikes_landed", "total_strikes_attempted",
+    "td_landed", "td_attempts", "sub_attempts",
+    "control_time_seconds", "time_fought_seconds",
+]
+
+# one session for all sync fetches: keep-alive connections to ufcstats.com
+# get reused instead of rebuilding TCP per request
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+    ),
+)
+
+# completed events never change, so cache responses on disk — re-runs and
+# crash-resumes hit local SQLite instead of the network
+_SESSION = CachedSession(
+    "ufcstats_cache",
+    backend="sqlite",
+    cache_control=True,
+    expire_after=timedelta(days=30),
+    allowable_codes=(200,),
+    stale_if_error=True,
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+async def _fetch(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str) -> bytes:
+    async with sem:
+        logger.info(f"Fetching {url}")
+        async with session.get(url, headers=_UA) as resp:
+            resp.raise_for_status()
+            return await resp.read()
+
+
+async def _fetch_all(urls: list[str]) -> list:
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit=32, limit_per_host=8)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        return await asyncio.gather(
+            *(_fetch(session, sem, url) for url in urls),
+            return_exceptions=True,
+        )
+
+
+def fetch_many(urls: list[str]) -> list[bytes | None]:
+    """
+    Download many URLs concurrently over one aiohttp connection pool
+    Requests are I/O bound, so fanning out hides the per-page RTT
+    Returns page bytes per URL, None where a fetch failed
+    """
+    results = asyncio.run(_fetch_all(urls))
+
+    pages: list[bytes | None] = []
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to fetch {url}: {result}")
+            pages.append(None)
+        else:
+            pages.append(result)
+    return pages
+
+
+def fetch_many_cached(urls: list[str]) -> list[bytes | None]:
+    """
+    fetch_many backed by the shared response cache: pages already on disk
+    are read from the cached session, only misses fan out over aiohttp,
+    and fetched pages are written back so re-runs skip them entirely
+    """
+    missing = [url for url in urls if not _SESSION.cache.contains(url=url)]
+    fetched = dict(zip(missing, fetch_many(missing)))
+
+    for url, body in fetched.items():
+        if body is None:
+            continue
+        # wrap the raw bytes as a requests.Response (with the urllib3-level
+        # response the cache serializer reads) so the cache can store it;
+        # completed fight pages never change, so no expiry
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.url = url
+        resp._content = body
+        resp.elapsed = timedelta(0)
+        resp.request = requests.Request("GET", url, headers=_UA).prepare()
+        resp.raw = HTTPResponse(
+            body=BytesIO(body), status=200, reason="OK", preload_content=False
+        )
+        resp.raw._request_url = url
+        _SESSION.cache.save_response(resp)
+
+    return [
+        fetched[url] if url in fetched
+        else _SESSION.get(url, headers=_UA, timeout=10).content
+        for url in urls
+    ]
+
+
+def get_soup(url: str, parse_only: SoupStrainer | None = None) -> BeautifulSoup:
     """
     Fetch a URL
     Return BeautifulSoup object (helper for HTTP + parsing)
+    `parse_only` restricts tree building to the matching subtrees
     """
     logger.info(f"Fetching {url}")
-    resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
+    resp = _SESSION.get(url, headers=_UA, timeout=10)
     resp.raise_for_status() # throw error
-    return BeautifulSoup(resp.text, "html.parser")
+    # lxml is the C-backed parser; feed it bytes so it handles encoding itself
+    return BeautifulSoup(resp.content, "lxml", parse_only=parse_only)
 
 def get_completed_event_urls(limit: int | None = None) -> list[str]:
     """
@@ -30,16 +184,21 @@ def get_completed_event_urls(limit: int | None = None) -> list[str]:
         http://ufcstats.com/event-details/xxxxxxxxxxxxxxxx
     `limit` allows you to only take the first N for testing.
     """
-    soup = get_soup(COMPLETED_EVENTS_URL)
-    event_urls=[]
+    # the index page gains rows as events happen; FORCE_REFRESH=1 evicts it
+    # from the cache (historical event/fight pages stay cached)
+    if os.getenv("FORCE_REFRESH"):
+        _SESSION.cache.delete(urls=[COMPLETED_EVENTS_URL])
+
+    soup = get_soup(COMPLETED_EVENTS_URL, parse_only=_LINK_STRAINER)
 
+    # dict keys dedupe in O(1) while keeping first-seen order
+    seen: dict[str, None] = {}
     for a in soup.find_all("a", href=True):
         href = a["href"]
         if "event-details" in href:
-            full_url = urlparse.urljoin(UFCSTATS_BASE, href)
-            if full_url not in event_urls:
-                event_urls.append(full_url)
-    
+            seen.setdefault(urlparse.urljoin(UFCSTATS_BASE, href), None)
+    event_urls = list(seen)
+
     if limit is not None:
         event_urls = event_urls[:limit]
 
@@ -74,14 +233,14 @@ def parse_x_of_y(text:str | None) -> tuple[int, int] | tuple[None, None]:
     if not text: 
         return (None, None)
     
-    m = re.search(r"(\d+)\s*of\s*(\d+)", text)
+    m = _X_OF_Y_RE.search(text)
     if not m: 
         return (None, None)
     
     return int(m.group(1)), int(m.group(2))
 
 def parse_fight_stats(
-    fight_url: str,
+    fight_html: bytes,
     fight_id: str,
     f1_id: str,
     f2_id: str,
@@ -90,26 +249,33 @@ def parse_fight_stats(
     time_ended: str | None,
 ) -> list[dict]:
     """
-    Scrapes ONE fight-details page from UFCStats and returns a list of
+    Parses ONE pre-fetched fight-details page and returns a list of
     two dicts, one row / fighter, matching the fighter_stats schema
+    Uses selectolax (lexbor) since this runs once per fight and dominates
+    per-fight CPU
     Returns [] if stats are missing
     """
-    soup = get_soup(fight_url)
+    tree = LexborHTMLParser(fight_html)
 
     # find the 'Totals' table by header labels
     totals_table = None
-    for tbl in soup.find_all("table"):
-        thead = tbl.find("thead", class_="b-fight-details__table-head")
-        tbody = tbl.find("tbody", class_="b-fight-details__table-body")
-        if not thead or not tbody:
+    tbody = None
+    labels: list[str] = []
+    for tbl in tree.css("table"):
+        thead = tbl.css_first("thead.b-fight-details__table-head")
+        tbody = tbl.css_first("tbody.b-fight-details__table-body")
+        if thead is None or tbody is None:
             continue
 
-        header_cells = thead.find_all(["th", "td"])
-        labels = [c.get_text(" ", strip=True).lower() for c in header_cells]
+        header_cells = thead.css("th, td")
+        labels = [c.text(separator=" ", strip=True).lower() for c in header_cells]
 
-        # needed stats 
-        required = ["fighter", "kd", "sig. str.", "total str.", "td", "sub. att", "ctrl"]
-        if all(any(req in lab for lab in labels) for req in required):
+        # needed stats: join the labels once (the NUL separator can't appear
+        # inside a label, so matches never span cells) and let C-level
+        # substring search replace the nested per-label loop; all() still
+        # bails on the first missing label
+        header_text = "\x00".join(labels)
+        if all(req in header_text for req in _REQUIRED_LABELS):
             totals_table = tbl
             break
 
@@ -117,13 +283,13 @@ def parse_fight_stats(
         logger.warning(f"No totals table found for fight {fight_id}")
         return []
 
-    row = tbody.find("tr")
-    if not row:
+    row = tbody.css_first("tr")
+    if row is None:
         logger.warning(f"No totals row found for fight {fight_id}")
         return []
 
     # all stat data in this row
-    cells = row.find_all("td", class_="b-fight-details__table-col")
+    cells = row.css("td.b-fight-details__table-col")
 
     # map column indices from header labels 
     kd_idx = sig_idx = tot_idx = td_idx = sub_idx = ctrl_idx = None
@@ -150,18 +316,17 @@ def parse_fight_stats(
         if col_idx < 0 or col_idx >= len(cells):
             return None
         cell = cells[col_idx]
-        ps = cell.find_all("p", class_="b-fight-details__table-text")
+        ps = cell.css("p.b-fight-details__table-text")
         if fighter_index < 0 or fighter_index >= len(ps):
             return None
-        return ps[fighter_index].get_text(" ", strip=True)
+        return ps[fighter_index].text(separator=" ", strip=True)
 
     fighter_cell = cells[0]
-    links = fighter_cell.find_all("a", href=re.compile("fighter-details"))
 
     id_order: list[str] = []
-    for a in links:
-        href = a.get("href", "").strip()
-        if href:
+    for a in fighter_cell.css("a"):
+        href = (a.attributes.get("href") or "").strip()
+        if href and "fighter-details" in href:
             fid = href.split("fighter-details/")[-1].strip("/")
             id_order.append(fid)
 
@@ -220,15 +385,58 @@ def parse_fight_stats(
     return stats_rows
 
 
-def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def fetch_event_html(url: str) -> bytes:
     """
-    Scrape one UFCStats event-details page
-    Return 3 DFs:
-    - df_fighters: columns [fighter_id, name]
-    - df_fights: matches 'fights' table schema (minus odds)
-    - df_stats: matches 'fighter_stats' schema (stubbed empty for now)
+    Fetch one event page through the cached session and return its bytes
+    (I/O half of parse_event, so fetching and parsing can be staged
+    separately)
     """
-    soup = get_soup(event_url)
+    logger.info(f"Fetching {url}")
+    resp = _SESSION.get(url, headers=_UA, timeout=10)
+    resp.raise_for_status()
+    return resp.content
+
+
+def extract_fight_urls(event_html: bytes) -> list[str]:
+    """
+    Pull the fight-details URLs out of one pre-fetched event page
+    Cheap link-only scan so the driver can prefetch every fight page
+    before the parse stage runs
+    """
+    soup = BeautifulSoup(event_html, "lxml", parse_only=_LINK_STRAINER)
+    seen: dict[str, None] = {}
+    for a in soup.find_all("a", href=_FIGHT_DETAILS_RE):
+        seen.setdefault(urlparse.urljoin(UFCSTATS_BASE, a["href"].strip()), None)
+    return list(seen)
+
+
+def parse_event(event_url: str) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Scrape one UFCStats event-details page (fetch + parse)
+    """
+    event_html = fetch_event_html(event_url)
+    fight_urls = extract_fight_urls(event_html)
+    fight_htmls = dict(zip(fight_urls, fetch_many_cached(fight_urls)))
+    return parse_event_from_html(event_url, event_html, fight_htmls)
+
+
+def parse_event_from_html(
+    event_url: str,
+    event_html: bytes,
+    fight_htmls: dict[str, bytes | None],
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Parse one pre-fetched UFCStats event-details page and its pre-fetched
+    fight-details pages (fight_htmls maps fight URL -> page bytes, None
+    where the fetch failed) — no network I/O, so it is safe to run in a
+    worker process
+    Return 3 lists of row dicts (plain lists so the driver can extend its
+    buffers and build each DataFrame once per batch):
+    - fighter rows: keys FIGHTER_COLS
+    - fight rows: FIGHT_COLS, matches 'fights' table schema (minus odds)
+    - stats rows: STATS_COLS, matches 'fighter_stats' schema
+    """
+    soup = BeautifulSoup(event_html, "lxml", parse_only=_EVENT_STRAINER)
 
     # extract event name and date
     title_span = soup.find("span", class_="b-content__title-highlight")
@@ -240,8 +448,10 @@ def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
         if "Date:" in text:
             date_str = text.split("Date:")[-1].strip()
             try:
-                event_date = datetime.strptime(date_str, "%B %d, %Y").date()
-            except ValueError:
+                # 'January 20, 2024' — see _MONTHS
+                month, day, year = date_str.replace(",", " ").split()
+                event_date = date(int(year), _MONTHS[month], int(day))
+            except (KeyError, ValueError):
                 logger.warning(f"Could not parse event date from '{date_str}'")
             break
 
@@ -255,17 +465,18 @@ def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
     fighters_dict: dict[str, dict] = {}
     fights_rows: list[dict] = []
     stats_rows: list[dict] = []
+    pending_stats: list[dict] = []  # fight pages to fetch + their parse args
 
     # find fights table
-    fight_table = soup.find("table", class_=re.compile("b-fight-details__table"))
+    fight_table = soup.find("table", class_=_TABLE_CLS_RE)
     if not fight_table:
         logger.error("Could not find fights table on event page")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return [], [], []
 
     tbody = fight_table.find("tbody")
     if not tbody:
         logger.error("Could not find tbody in fights table")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return [], [], []
 
     # loop thru each fight row
     for row in tbody.find_all("tr"):
@@ -274,7 +485,7 @@ def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
             continue  # skip header/empty rows
 
         # get fight URL and fight
-        fight_link = row.find("a", href=re.compile("fight-details"))
+        fight_link = row.find("a", href=_FIGHT_DETAILS_RE)
         if not fight_link:
             logger.warning("Skipping row without fight-details link")
             continue
@@ -283,7 +494,7 @@ def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
         fight_id = fight_url.split("fight-details/")[-1].strip("/")
 
         # get fighter names + fighter_ids
-        fighter_links = row.find_all("a", href=re.compile("fighter-details"))
+        fighter_links = row.find_all("a", href=_FIGHTER_DETAILS_RE)
         if len(fighter_links) != 2:
             logger.warning(f"Expected 2 fighter links, found {len(fighter_links)} in row; skipping")
             continue
@@ -331,23 +542,34 @@ def parse_event(event_url: str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFram
             }
         )
 
+        pending_stats.append(
+            {
+                "fight_url": fight_url,
+                "fight_id": fight_id,
+                "f1_id": f1_id,
+                "f2_id": f2_id,
+                "winner_id": winner_id,
+                "round_ended": round_ended,
+                "time_ended": time_ended,
+            }
+        )
+
+    for pending in pending_stats:
+        fight_html = fight_htmls.get(pending["fight_url"])
+        if fight_html is None:
+            continue  # fetch failure already logged
         try:
             fight_stats_rows = parse_fight_stats(
-                fight_url=fight_url,
-                fight_id=fight_id,
-                f1_id=f1_id,
-                f2_id=f2_id,
-                winner_id=winner_id,
-                round_ended=round_ended,
-                time_ended=time_ended,
+                fight_html=fight_html,
+                fight_id=pending["fight_id"],
+                f1_id=pending["f1_id"],
+                f2_id=pending["f2_id"],
+                winner_id=pending["winner_id"],
+                round_ended=pending["round_ended"],
+                time_ended=pending["time_ended"],
             )
             stats_rows.extend(fight_stats_rows)
         except Exception as e:
-            logger.warning(f"Failed to parse stats for fight {fight_id}: {e}")
-
-    # build dataframes
-    df_fighters = pd.DataFrame(list(fighters_dict.values()))
-    df_fights = pd.DataFrame(fights_rows)
-    df_stats = pd.DataFrame(stats_rows) 
+            logger.warning(f"Failed to parse stats for fight {pending['fight_id']}: {e}")
 
-    return df_fighters, df_fights, df_stats
\ No newline at end of file
+    return list(fighters_dict.values()), fights_rows, stats_rows
\ No newline at end of file